@@ -2,15 +2,10 @@
 
 def _generate_partner_token(env):
     """Post-installation hook to generate external tokens for existing partners"""
-    # Generate external tokens for all existing partners that don't have one
-    partners_without_token = env['res.partner'].search([
-        ('external_token', '=', False)
-    ])
-    
-    if partners_without_token:
-        partners_without_token.generate_external_token()
-        env.cr.commit()
-        print(f"Generated external tokens for {len(partners_without_token)} partners")
+    # Tokens are written with set-based SQL in batches, committing after each
+    # batch, so big partner tables do not sit in one long install transaction
+    env['res.partner']._generate_missing_external_tokens(commit=True)
 
 from . import models
-from . import controllers
\ No newline at end of file
+from . import controllers
+from . import wizard
@@ -26,14 +26,16 @@
     'data': [
         'security/ir.model.access.csv',
         'data/ir_sequence_data.xml',
+        'data/ir_cron_data.xml',
         'views/invoice_request_views.xml',
         'views/partner_views.xml',
+        'wizard/partner_token_wizard_views.xml',
         'templates/external_invoice_request.xml',
     ],
     'assets': {
         'web.assets_frontend': [
-            # 'odoo_module/static/src/xml/external_invoice_form.xml',
-            # 'odoo_module/static/src/js/external_invoice_form.js',
+            'odoo_module/static/src/xml/external_invoice_form.xml',
+            'odoo_module/static/src/js/external_invoice_form.js',
             'odoo_module/static/src/css/external_invoice_form.css',
         ],
     },
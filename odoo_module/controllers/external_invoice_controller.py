@@ -1,16 +1,108 @@
 # -*- coding: utf-8 -*-
 
+import hashlib
 import json
+from urllib.parse import urlencode
 from odoo import http, fields
 from odoo.http import request
 from odoo.exceptions import UserError, ValidationError
 
+from .route_timing import instrumented, timed
+
+# Page size of the available sale orders list (default and upper bound)
+SALE_ORDER_PAGE_LIMIT = 50
+SALE_ORDER_PAGE_MAX_LIMIT = 200
+
+# Page size of the approved request history (default and upper bound)
+HISTORY_PAGE_LIMIT = 20
+HISTORY_PAGE_MAX_LIMIT = 100
+
 
 class ExternalInvoiceController(http.Controller):
 
-    @http.route('/external/sale-invoice/<string:token>', type='http', auth='public', website=True, csrf=False)
-    def external_invoice_form(self, token, **kwargs):
-        """External invoice request form accessible without login"""
+    def _search_available_sale_orders(self, partner, q=None, limit=None, cursor=None):
+        """Return one page of available sale orders and the cursor of the next one.
+        Pages are keyed on the sale order id (newest first) so that fetching
+        later pages does not need an OFFSET scan.
+        """
+        try:
+            limit = min(max(int(limit), 1), SALE_ORDER_PAGE_MAX_LIMIT) if limit else SALE_ORDER_PAGE_LIMIT
+        except ValueError:
+            limit = SALE_ORDER_PAGE_LIMIT
+        domain = request.env['invoice.request']._available_sale_orders_domain(partner.id)
+        if q:
+            domain.append(('name', 'ilike', q))
+        if cursor and str(cursor).isdigit():
+            domain.append(('id', '<', int(cursor)))
+        sale_orders = request.env['sale.order'].sudo().search(domain, order='id desc', limit=limit + 1)
+        next_cursor = None
+        if len(sale_orders) > limit:
+            sale_orders = sale_orders[:limit]
+            next_cursor = sale_orders[-1].id
+        return sale_orders, next_cursor
+
+    def _search_request_history(self, partner, limit=None, before=None):
+        """Return one page of approved requests, newest first, and the cursor
+        of the next (older) page. Archived requests stay reachable here.
+        """
+        try:
+            limit = min(max(int(limit), 1), HISTORY_PAGE_MAX_LIMIT) if limit else HISTORY_PAGE_LIMIT
+        except ValueError:
+            limit = HISTORY_PAGE_LIMIT
+        domain = [
+            ('partner_id', '=', partner.id),
+            ('state', '=', 'approved'),
+            ('invoice_id', '!=', False),
+        ]
+        if before and str(before).isdigit():
+            domain.append(('id', '<', int(before)))
+        approved_requests = request.env['invoice.request'].sudo().with_context(active_test=False).search(
+            domain, order='id desc', limit=limit + 1
+        )
+        next_cursor = None
+        if len(approved_requests) > limit:
+            approved_requests = approved_requests[:limit]
+            next_cursor = approved_requests[-1].id
+        return approved_requests, next_cursor
+
+    def _form_url(self, token, **params):
+        """URL of the form page with the given non-empty query parameters"""
+        query = urlencode({key: value for key, value in params.items() if value})
+        return '/external/sale-invoice/%s%s' % (token, '?' + query if query else '')
+
+    def _serialize_requests(self, invoice_requests):
+        res = []
+        for req in invoice_requests:
+            res.append({
+                'id': req.id,
+                'name': req.name or '',
+                'sale_order': req.sale_id.name,
+                'state': req.state,
+                'request_date': req.request_date.strftime('%Y-%m-%d %H:%M') if req.request_date else '',
+                'approval_date': req.approval_date.strftime('%Y-%m-%d %H:%M') if req.approval_date else '',
+                'invoice_id': req.invoice_id.id if req.invoice_id else None,
+                'invoice_name': req.invoice_id.name if req.invoice_id else None,
+            })
+        return res
+
+    def _serialize_sale_orders(self, sale_orders):
+        return [
+            {
+                'id': so.id,
+                'name': so.name or '',
+                'amount_total': so.amount_total,
+            }
+            for so in sale_orders
+        ]
+
+    @http.route('/external/sale-invoice/<string:token>', type='http', auth='public', website=True, csrf=False, rate_limit='json')
+    @instrumented('form')
+    def external_invoice_form(self, token, q=None, cursor=None, before=None, **kwargs):
+        """External invoice request form accessible without login.
+        ``q`` and ``cursor`` search and page the sale orders, and ``before``
+        pages the approved requests, of the server-rendered form used when
+        JavaScript is unavailable.
+        """
         partner = request.env['res.partner'].sudo().search([('external_token', '=', token)], limit=1)
         
         if not partner:
@@ -18,32 +110,17 @@ class ExternalInvoiceController(http.Controller):
                 'message': 'Invalid or expired token. Please contact your administrator.'
             })
         
-        # Get sale orders available for this partner excluding those already requested (pending/approved)
-        requested_sale_ids = request.env['invoice.request'].sudo().search([
-            ('partner_id', '=', partner.id),
-            ('sale_id', '!=', False),
-            ('state', 'in', ['pending', 'approved'])
-        ]).mapped('sale_id').ids
-
-        sale_orders = request.env['sale.order'].sudo().search([
-            ('partner_id', '=', partner.id),
-            ('state', '=', 'sale'),
-            ('invoice_status', '=', 'to invoice'),
-            ('id', 'not in', requested_sale_ids),
-        ])
+        # First page of sale orders available for this partner excluding those already requested (pending/processing/approved)
+        sale_orders, next_cursor = self._search_available_sale_orders(partner, q=q, cursor=cursor)
         
-        # Get pending invoice requests
+        # Get pending invoice requests (including those queued for approval)
         pending_requests = request.env['invoice.request'].sudo().search([
             ('partner_id', '=', partner.id),
-            ('state', '=', 'pending')
+            ('state', 'in', ['pending', 'processing'])
         ])
         
-        # Get approved requests with invoices
-        approved_requests = request.env['invoice.request'].sudo().search([
-            ('partner_id', '=', partner.id),
-            ('state', '=', 'approved'),
-            ('invoice_id', '!=', False)
-        ])
+        # Get the latest approved requests with invoices, older ones are paged in on demand
+        approved_requests, approved_next_cursor = self._search_request_history(partner, before=before)
         
         # Build JSON-friendly props for OWL component
         props = {
@@ -52,120 +129,186 @@ class ExternalInvoiceController(http.Controller):
                 'name': partner.name or '',
                 'email': partner.email or '',
             },
-            'sale_orders': [
-                {
-                    'id': so.id,
-                    'name': so.name or '',
-                    'amount_total': so.amount_total,
-                }
-                for so in sale_orders
-            ],
-            'pending_requests': [
-                {
-                    'id': req.id,
-                    'name': req.name or '',
-                }
-                for req in pending_requests
-            ],
-            'approved_requests': [
-                {
-                    'id': req.id,
-                    'name': req.name or '',
-                }
-                for req in approved_requests
-            ],
+            'sale_orders': self._serialize_sale_orders(sale_orders),
+            'sale_orders_next_cursor': next_cursor,
+            'sale_orders_query': q or '',
+            'pending_requests': self._serialize_requests(pending_requests),
+            'approved_requests': self._serialize_requests(approved_requests),
+            'approved_next_cursor': approved_next_cursor,
             'token': token,
         }
 
         return request.render('odoo_module.external_invoice_form', {
             'partner': partner,
             'sale_orders': sale_orders,
+            'sale_orders_query': q or '',
+            'sale_orders_next_url': next_cursor and self._form_url(token, q=q, cursor=next_cursor, before=before),
             'pending_requests': pending_requests,
             'approved_requests': approved_requests,
+            'approved_next_url': approved_next_cursor and self._form_url(
+                token, q=q, cursor=cursor, before=approved_next_cursor
+            ),
             'token': token,
             'external_invoice_form_props_json': json.dumps(props),
         })
 
-    @http.route('/external/sale-invoice/<string:token>/available_sos', type='http', auth='public', methods=['GET'], website=True, csrf=False)
-    def get_available_sale_orders(self, token, **kwargs):
-        """Return currently available sale orders for a partner token.
-        Used by the client to refresh the dropdown without full page reload.
+    @http.route('/external/sale-invoice/<string:token>/available_sos', type='http', auth='public', methods=['GET'], website=True, csrf=False, rate_limit='json')
+    @instrumented('available_sos')
+    def get_available_sale_orders(self, token, q=None, limit=None, cursor=None, **kwargs):
+        """Return a page of currently available sale orders for a partner token.
+        Used by the client typeahead without full page reload. Supports
+        ``q`` (name search), ``limit`` and ``cursor`` (``next_cursor`` of the
+        previous page), and answers 304 when the page is unchanged.
         """
         partner = request.env['res.partner'].sudo().search([('external_token', '=', token)], limit=1)
 
         if not partner:
             return json.dumps({'success': False, 'error': 'Invalid or expired token'})
 
-        requested_sale_ids = request.env['invoice.request'].sudo().search([
-            ('partner_id', '=', partner.id),
-            ('sale_id', '!=', False),
-            ('state', 'in', ['pending', 'approved'])
-        ]).mapped('sale_id').ids
+        sale_orders, next_cursor = self._search_available_sale_orders(partner, q=q, limit=limit, cursor=cursor)
 
-        sale_orders = request.env['sale.order'].sudo().search([
-            ('partner_id', '=', partner.id),
-            ('state', '=', 'sale'),
-            ('invoice_status', '=', 'to invoice'),
-            ('id', 'not in', requested_sale_ids),
-        ])
+        body = json.dumps({
+            'success': True,
+            'sale_orders': self._serialize_sale_orders(sale_orders),
+            'next_cursor': next_cursor,
+        })
+        etag = hashlib.sha1(body.encode()).hexdigest()
+        headers = [
+            ('ETag', '"%s"' % etag),
+            ('Cache-Control', 'private, no-cache'),
+        ]
+        if request.httprequest.if_none_match.contains(etag):
+            return request.make_response('', headers=headers, status=304)
+        return request.make_response(body, headers=[('Content-Type', 'application/json')] + headers)
 
-        data = [{
-            'id': so.id,
-            'name': so.name or '',
-            'amount_total': so.amount_total,
-        } for so in sale_orders]
+    def _get_sale_order_ids(self, kwargs):
+        """Collect the submitted sale order ids.
+        Accepts repeated ``sale_order_ids`` fields, a comma separated
+        ``sale_order_ids`` value or the single ``sale_order_id`` field.
+        """
+        values = request.httprequest.form.getlist('sale_order_ids') or [kwargs.get('sale_order_ids') or '']
+        values.append(kwargs.get('sale_order_id') or '')
+        sale_order_ids = []
+        for value in values:
+            for part in str(value).split(','):
+                part = part.strip()
+                if part.isdigit() and int(part) not in sale_order_ids:
+                    sale_order_ids.append(int(part))
+        return sale_order_ids
 
-        return json.dumps({'success': True, 'sale_orders': data})
+    def _create_invoice_requests(self, vals_list):
+        """Create the invoice requests in one batch inside a savepoint.
+        If the batch fails it is rolled back and, when it held several
+        orders, each request is retried in its own savepoint so that every
+        order reports its own outcome.
+        Returns the created requests and the error message per sale order id.
+        """
+        InvoiceRequest = request.env['invoice.request'].sudo()
+        invoice_requests = InvoiceRequest
+        batches = [vals_list]
+        errors = {}
+        while batches:
+            batch = batches.pop(0)
+            try:
+                with request.env.cr.savepoint():
+                    invoice_requests |= InvoiceRequest.create(batch)
+            except Exception as e:
+                if len(batch) > 1:
+                    batches.extend([vals] for vals in batch)
+                    continue
+                message = e.args[0] if isinstance(e, UserError) and e.args else str(e)
+                errors[batch[0]['sale_id']] = message
+        return invoice_requests, errors
 
-    @http.route('/external/sale-invoice/<string:token>/request', type='http', auth='public', methods=['POST'], website=True, csrf=False)
+    @http.route('/external/sale-invoice/<string:token>/request', type='http', auth='public', methods=['POST'], website=True, csrf=False, rate_limit='json')
+    @instrumented('request')
     def create_invoice_request(self, token, **kwargs):
-        """Create a new invoice request"""
+        """Create invoice requests for one or several sale orders"""
         partner = request.env['res.partner'].sudo().search([('external_token', '=', token)], limit=1)
         
         if not partner:
             return json.dumps({'success': False, 'message': 'Invalid token'})
         
-        sale_order_id = kwargs.get('sale_order_id')
-        if not sale_order_id:
+        sale_order_ids = self._get_sale_order_ids(kwargs)
+        if not sale_order_ids:
             return json.dumps({'success': False, 'message': 'Sale order is required'})
         
         try:
-            # Verify the sale order belongs to the partner
-            sale_order = request.env['sale.order'].sudo().browse(int(sale_order_id))
-            if sale_order.partner_id != partner:
-                return json.dumps({'success': False, 'message': 'Invalid sale order'})
+            # Validate all submitted sale orders against the partner at once
+            sale_orders = {
+                so['id']: so
+                for so in request.env['sale.order'].sudo().search_read([
+                    ('id', 'in', sale_order_ids),
+                    ('partner_id', '=', partner.id),
+                ], ['state', 'invoice_status'])
+            }
             
-            # Check if there's already a request (pending/approved) for this sale order
-            existing_request = request.env['invoice.request'].sudo().search([
-                ('partner_id', '=', partner.id),
-                ('sale_id', '=', sale_order_id),
-                ('state', 'in', ['pending', 'approved'])
-            ], limit=1)
-            
-            if existing_request:
-                return json.dumps({'success': False, 'message': 'A pending request already exists for this sale order'})
+            # Sale orders that already have a request (pending/processing/approved)
+            requested_sale_ids = set(request.env['invoice.request'].sudo().with_context(active_test=False).search([
+                ('sale_id', 'in', list(sale_orders)),
+                ('state', 'in', ['pending', 'processing', 'approved'])
+            ]).mapped('sale_id').ids)
 
-            # Validate SO is still available (to invoice and in sale state)
-            if sale_order.state != 'sale' or sale_order.invoice_status != 'to invoice':
-                return json.dumps({'success': False, 'message': 'Selected sale order is no longer available for invoicing'})
-            
-            # Create the invoice request
-            invoice_request = request.env['invoice.request'].sudo().create({
-                'partner_id': partner.id,
-                'sale_id': sale_order_id,
-                'state': 'pending',
-            })
+            results = []
+            vals_list = []
+            for sale_order_id in sale_order_ids:
+                sale_order = sale_orders.get(sale_order_id)
+                if not sale_order:
+                    message = 'Invalid sale order'
+                elif sale_order_id in requested_sale_ids:
+                    message = 'A pending request already exists for this sale order'
+                elif sale_order['state'] != 'sale' or sale_order['invoice_status'] != 'to invoice':
+                    message = 'Selected sale order is no longer available for invoicing'
+                else:
+                    vals_list.append({
+                        'partner_id': partner.id,
+                        'sale_id': sale_order_id,
+                        'state': 'pending',
+                    })
+                    message = None
+                results.append({
+                    'sale_order_id': sale_order_id,
+                    'success': message is None,
+                    'message': message or 'Invoice request created successfully',
+                })
             
-            return json.dumps({
-                'success': True, 
-                'message': 'Invoice request created successfully',
-                'request_id': invoice_request.id
-            })
+            # Create all invoice requests in a single batch; a failed batch is
+            # rolled back and reported per sale order
+            invoice_requests, errors = self._create_invoice_requests(vals_list)
+            request_by_sale = {req.sale_id.id: req.id for req in invoice_requests}
+            for result in results:
+                if result['sale_order_id'] in errors:
+                    result['success'] = False
+                    result['message'] = errors[result['sale_order_id']]
+                elif result['success']:
+                    result['request_id'] = request_by_sale[result['sale_order_id']]
+
+            # Delta for the client: the new pending requests, and the submitted
+            # orders that must leave the available list (now requested or no
+            # longer invoiceable)
+            response = {
+                'success': bool(invoice_requests),
+                'message': '%s of %s invoice requests created' % (len(invoice_requests), len(results)),
+                'request_ids': invoice_requests.ids,
+                'results': results,
+                'created_requests': self._serialize_requests(invoice_requests),
+                'removed_sale_order_ids': [
+                    result['sale_order_id'] for result in results
+                    if result['success'] or result['sale_order_id'] in sale_orders
+                ],
+            }
+            # Single order submissions keep the original response shape
+            if len(results) == 1:
+                response['message'] = results[0]['message']
+                if invoice_requests:
+                    response['request_id'] = invoice_requests.id
+            return json.dumps(response)
             
         except Exception as e:
             return json.dumps({'success': False, 'message': str(e)})
 
-    @http.route('/external/sale-invoice/<string:token>/download/<int:invoice_id>', type='http', auth='public', website=True, csrf=False)
+    @http.route('/external/sale-invoice/<string:token>/download/<int:invoice_id>', type='http', auth='public', website=True, csrf=False, rate_limit='pdf')
+    @instrumented('download')
     def download_invoice_pdf(self, token, invoice_id, **kwargs):
         """Download invoice PDF"""
         partner = request.env['res.partner'].sudo().search([('external_token', '=', token)], limit=1)
@@ -174,7 +317,7 @@ class ExternalInvoiceController(http.Controller):
             return request.not_found()
         
         # Verify the invoice belongs to a request from this partner
-        invoice_request = request.env['invoice.request'].sudo().search([
+        invoice_request = request.env['invoice.request'].sudo().with_context(active_test=False).search([
             ('partner_id', '=', partner.id),
             ('invoice_id', '=', invoice_id),
             ('state', '=', 'approved')
@@ -188,7 +331,8 @@ class ExternalInvoiceController(http.Controller):
             return request.not_found()
         
         # Generate PDF report
-        report = request.env['ir.actions.report'].sudo()._render_qweb_pdf('account.report_invoice', [invoice_id])
+        with timed('pdf'):
+            report = request.env['ir.actions.report'].sudo()._render_qweb_pdf('account.report_invoice', [invoice_id])
         
         if not report or not report[0]:
             return request.not_found()
@@ -201,9 +345,14 @@ class ExternalInvoiceController(http.Controller):
         
         return request.make_response(report[0], headers=pdfhttpheaders)
 
-    @http.route('/external/sale-invoice/<string:token>/status', type='http', auth='public', methods=['GET'], website=True, csrf=False)
-    def get_request_status(self, token, **kwargs):
-        """Get current status of invoice requests for AJAX updates"""
+    @http.route('/external/sale-invoice/<string:token>/status', type='http', auth='public', methods=['GET'], website=True, csrf=False, rate_limit='json')
+    @instrumented('status')
+    def get_request_status(self, token, limit=None, before=None, **kwargs):
+        """Get current status of invoice requests for AJAX updates.
+        Approved requests are paginated: ``limit`` sets the page size and
+        ``before`` (``approved_next_cursor`` of the previous page) returns
+        older requests.
+        """
         partner = request.env['res.partner'].sudo().search([('external_token', '=', token)], limit=1)
         
         if not partner:
@@ -211,29 +360,13 @@ class ExternalInvoiceController(http.Controller):
         
         # Return separated lists for pending and approved
         pending_reqs = request.env['invoice.request'].sudo().search([
-            ('partner_id', '=', partner.id), ('state', '=', 'pending')
-        ])
-        approved_reqs = request.env['invoice.request'].sudo().search([
-            ('partner_id', '=', partner.id), ('state', '=', 'approved')
+            ('partner_id', '=', partner.id), ('state', 'in', ['pending', 'processing'])
         ])
-
-        def _serialize(recs):
-            res = []
-            for req in recs:
-                res.append({
-                    'id': req.id,
-                    'name': req.name or '',
-                    'sale_order': req.sale_id.name,
-                    'state': req.state,
-                    'request_date': req.request_date.strftime('%Y-%m-%d %H:%M') if req.request_date else '',
-                    'approval_date': req.approval_date.strftime('%Y-%m-%d %H:%M') if req.approval_date else '',
-                    'invoice_id': req.invoice_id.id if req.invoice_id else None,
-                    'invoice_name': req.invoice_id.name if req.invoice_id else None,
-                })
-            return res
+        approved_reqs, approved_next_cursor = self._search_request_history(partner, limit=limit, before=before)
 
         return json.dumps({
             'success': True,
-            'pending_requests': _serialize(pending_reqs),
-            'approved_requests': _serialize(approved_reqs),
+            'pending_requests': self._serialize_requests(pending_reqs),
+            'approved_requests': self._serialize_requests(approved_reqs),
+            'approved_next_cursor': approved_next_cursor,
         })
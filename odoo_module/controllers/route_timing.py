@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+
+import functools
+import logging
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+from odoo.http import request
+
+_logger = logging.getLogger(__name__)
+
+# Share of requests instrumented when the odoo_module.timing_sample_rate
+# system parameter is not set (0 disables, 1 instruments every request).
+# Each instrumented request writes one INFO log line.
+DEFAULT_SAMPLE_RATE = 0.01
+
+_ENVIRON_KEY = 'odoo_module.timings'
+
+
+def _get_sample_rate():
+    param = request.env['ir.config_parameter'].sudo().get_param('odoo_module.timing_sample_rate')
+    try:
+        return float(param) if param else DEFAULT_SAMPLE_RATE
+    except ValueError:
+        return DEFAULT_SAMPLE_RATE
+
+
+@contextmanager
+def timed(name):
+    """Record the duration of a block under ``name`` in the Server-Timing
+    header of the current request, when that request is sampled."""
+    timings = request.httprequest.environ.get(_ENVIRON_KEY)
+    if timings is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[name] = timings.get(name, 0.0) + time.perf_counter() - start
+
+
+def instrumented(route_name):
+    """Measure wall time and SQL usage of a sampled route call.
+
+    The measures are returned in a ``Server-Timing`` response header and
+    logged as one line per call, tagged with ``route_name``.
+    """
+    def decorator(endpoint):
+        @functools.wraps(endpoint)
+        def wrapper(self, *args, **kwargs):
+            if random.random() >= _get_sample_rate():
+                return endpoint(self, *args, **kwargs)
+
+            # Odoo keeps per-thread SQL counters for the current HTTP request
+            thread = threading.current_thread()
+            query_count = getattr(thread, 'query_count', 0)
+            query_time = getattr(thread, 'query_time', 0.0)
+            timings = request.httprequest.environ[_ENVIRON_KEY] = {}
+            start = time.perf_counter()
+
+            response = endpoint(self, *args, **kwargs)
+            # request.render() is lazy: render the template now so its QWeb
+            # work and ORM reads are part of the measure
+            if getattr(response, 'is_qweb', False):
+                response.flatten()
+
+            wall = time.perf_counter() - start
+            sql_count = getattr(thread, 'query_count', 0) - query_count
+            sql_time = getattr(thread, 'query_time', 0.0) - query_time
+            metrics = ['total;dur=%.1f' % (wall * 1000), 'sql;dur=%.1f;desc="%d queries"' % (sql_time * 1000, sql_count)]
+            metrics += ['%s;dur=%.1f' % (name, duration * 1000) for name, duration in sorted(timings.items())]
+
+            if isinstance(response, (str, bytes)):
+                response = request.make_response(response)
+            if hasattr(response, 'headers'):
+                response.headers['Server-Timing'] = ', '.join(metrics)
+
+            _logger.info(
+                "route=%s wall=%.1fms sql_count=%d sql_time=%.1fms%s",
+                route_name, wall * 1000, sql_count, sql_time * 1000,
+                ''.join(' %s=%.1fms' % (name, duration * 1000) for name, duration in sorted(timings.items())),
+            )
+            return response
+        return wrapper
+    return decorator
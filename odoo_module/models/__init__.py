@@ -2,3 +2,6 @@
 
 from . import invoice_request
 from . import res_partner
+from . import sale_order
+from . import rate_limit
+from . import ir_http
@@ -1,9 +1,25 @@
 # -*- coding: utf-8 -*-
 
-from odoo import models, fields, api, _
+from odoo import models, fields, api, tools, _
 from odoo.exceptions import UserError, ValidationError
+import logging
+import time
 import uuid
 
+_logger = logging.getLogger(__name__)
+
+# Defaults of the background approval worker, overridable through the
+# odoo_module.approval_batch_size / odoo_module.approval_max_batches
+# system parameters
+APPROVAL_BATCH_SIZE = 20
+APPROVAL_MAX_BATCHES = 10
+
+# Defaults of the archival job, overridable through the
+# odoo_module.archive_after_days / odoo_module.archive_batch_size
+# system parameters
+ARCHIVE_AFTER_DAYS = 365
+ARCHIVE_BATCH_SIZE = 1000
+
 
 class InvoiceRequest(models.Model):
     _name = 'invoice.request'
@@ -36,6 +52,7 @@ class InvoiceRequest(models.Model):
     )
     state = fields.Selection([
         ('pending', 'Pending'),
+        ('processing', 'Processing'),
         ('approved', 'Approved'),
     ], string='Status', default='pending', required=True)
     
@@ -55,105 +72,263 @@ class InvoiceRequest(models.Model):
         readonly=True
     )
     notes = fields.Text(string='Notes')
+    active = fields.Boolean(
+        string='Active',
+        default=True,
+        help='Old approved requests are archived to keep default searches small'
+    )
+
+    # Background approval tracking
+    queued_date = fields.Datetime(
+        string='Queued Date',
+        readonly=True
+    )
+    queued_by = fields.Many2one(
+        'res.users',
+        string='Queued By',
+        readonly=True
+    )
+    processing_time = fields.Float(
+        string='Processing Time (s)',
+        readonly=True,
+        group_operator='avg'
+    )
+    processing_error = fields.Text(
+        string='Processing Error',
+        readonly=True
+    )
+
+    def init(self):
+        # Portal lookups and history pages filter on partner and state and
+        # page on id
+        tools.create_index(
+            self._cr, 'invoice_request_partner_state_id_idx',
+            self._table, ['partner_id', 'state', 'id']
+        )
+        # The archive cron walks the approved, still active requests oldest
+        # first; archived rows leave this partial index
+        tools.create_index(
+            self._cr, 'invoice_request_approved_active_date_idx',
+            self._table, ['approval_date'],
+            where="state = 'approved' AND active"
+        )
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        to_name = [vals for vals in vals_list if vals.get('name', _('New')) == _('New')]
+        for vals, name in zip(to_name, self._next_sequence_names(len(to_name))):
+            vals['name'] = name
+        return super(InvoiceRequest, self).create(vals_list)
 
     @api.model
-    def create(self, vals):
-        if vals.get('name', _('New')) == _('New'):
-            vals['name'] = self.env['ir.sequence'].next_by_code('invoice.request') or _('New')
-        return super(InvoiceRequest, self).create(vals)
+    def _next_sequence_names(self, count):
+        """Draw ``count`` references from the invoice.request sequence at once"""
+        if not count:
+            return []
+        sequence = self.env['ir.sequence'].sudo().search([
+            ('code', '=', 'invoice.request'),
+            ('company_id', 'in', [self.env.company.id, False]),
+        ], order='company_id', limit=1)
+        # Gapless and date-range sequences keep their row-locking semantics
+        if not sequence or sequence.implementation != 'standard' or sequence.use_date_range:
+            return [self.env['ir.sequence'].next_by_code('invoice.request') or _('New') for _i in range(count)]
+        self.env.cr.execute(
+            "SELECT nextval(%s) FROM generate_series(1, %s)",
+            ['ir_sequence_%03d' % sequence.id, count]
+        )
+        return [sequence.get_next_char(row[0]) for row in self.env.cr.fetchall()]
 
     def approval_request(self):
         """Approve the invoice request and create invoice"""
         for record in self:
             if record.state != 'pending':
                 raise UserError(_('Only pending requests can be approved.'))
-            
-            if not record.sale_id:
-                raise UserError(_('Sale Order is required to create invoice.'))
-            
-            # Check if sale order is in correct state
-            if record.sale_id.state != 'sale':
-                raise UserError(_('Sale Order must be in "Sale" state to create invoice.'))
-            
-            if record.sale_id.invoice_status != 'to invoice':
-                raise UserError(_('Sale Order must have "To Invoice" status to create invoice.'))
-            
-            # Create invoice from sale order
-            invoice_vals = {
-                'partner_id': record.partner_id.id,
-                'move_type': 'out_invoice',
-                'invoice_origin': record.sale_id.name,
-                'invoice_line_ids': [],
-            }
-            
-            # Create invoice lines from sale order lines
-            for line in record.sale_id.order_line:
-                if line.product_id.invoice_policy == 'order':
-                    invoice_line_vals = {
-                        'product_id': line.product_id.id,
-                        'quantity': line.product_uom_qty,
-                        'price_unit': line.price_unit,
-                        'name': line.name,
-                        'product_uom_id': line.product_uom.id,
-                    }
-                    invoice_vals['invoice_line_ids'].append((0, 0, invoice_line_vals))
-            
-            # Create the invoice
-            invoice = self.env['account.move'].create(invoice_vals)
-            
-            # Post the invoice
-            invoice.action_post()
-            
-            # Update the request
-            record.write({
-                'state': 'approved',
-                'invoice_id': invoice.id,
-                'approval_date': fields.Datetime.now(),
-                'approved_by': self.env.user.id,
-            })
-            
-            # Update sale order invoice status
-            record.sale_id._compute_invoice_status()
+            record._process_approval()
+        
+        return True
+
+    def _process_approval(self, approved_by=None):
+        """Create and post the invoice of a single request and mark it approved"""
+        self.ensure_one()
+        started = time.monotonic()
+        
+        if not self.sale_id:
+            raise UserError(_('Sale Order is required to create invoice.'))
+        
+        # Check if sale order is in correct state
+        if self.sale_id.state != 'sale':
+            raise UserError(_('Sale Order must be in "Sale" state to create invoice.'))
+        
+        if self.sale_id.invoice_status != 'to invoice':
+            raise UserError(_('Sale Order must have "To Invoice" status to create invoice.'))
+        
+        # Create invoice from sale order
+        invoice_vals = {
+            'partner_id': self.partner_id.id,
+            'company_id': self.sale_id.company_id.id,
+            'move_type': 'out_invoice',
+            'invoice_origin': self.sale_id.name,
+            'invoice_line_ids': [],
+        }
         
+        # Create invoice lines from sale order lines
+        for line in self.sale_id.order_line:
+            if line.product_id.invoice_policy == 'order':
+                invoice_line_vals = {
+                    'product_id': line.product_id.id,
+                    'quantity': line.product_uom_qty,
+                    'price_unit': line.price_unit,
+                    'name': line.name,
+                    'product_uom_id': line.product_uom.id,
+                }
+                invoice_vals['invoice_line_ids'].append((0, 0, invoice_line_vals))
+        
+        # Create the invoice
+        invoice = self.env['account.move'].create(invoice_vals)
+        
+        # Post the invoice
+        invoice.action_post()
+        
+        # Update the request
+        self.write({
+            'state': 'approved',
+            'invoice_id': invoice.id,
+            'approval_date': fields.Datetime.now(),
+            'approved_by': (approved_by or self.env.user).id,
+            'processing_time': time.monotonic() - started,
+            'processing_error': False,
+        })
+        
+        # Update sale order invoice status
+        self.sale_id._compute_invoice_status()
+
+    def action_queue_approval(self):
+        """Queue pending requests for approval by the background worker"""
+        if any(record.state != 'pending' for record in self):
+            raise UserError(_('Only pending requests can be approved.'))
+        self.write({
+            'state': 'processing',
+            'queued_date': fields.Datetime.now(),
+            'queued_by': self.env.user.id,
+            'processing_error': False,
+        })
+        self.env.ref('odoo_module.ir_cron_process_invoice_approvals')._trigger()
         return True
 
+    @api.model
+    def _cron_process_approvals(self):
+        """Approve queued requests in bounded batches, one transaction per batch.
+        Failed requests go back to pending with the error recorded on them.
+        """
+        ICP = self.env['ir.config_parameter'].sudo()
+        batch_size = int(ICP.get_param('odoo_module.approval_batch_size', APPROVAL_BATCH_SIZE))
+        max_batches = int(ICP.get_param('odoo_module.approval_max_batches', APPROVAL_MAX_BATCHES))
+        self.flush_model(['state', 'queued_date'])
+        for _batch in range(max_batches):
+            # SKIP LOCKED lets several cron workers drain the queue side by side
+            self.env.cr.execute("""
+                SELECT id FROM invoice_request
+                 WHERE state = 'processing'
+                 ORDER BY queued_date, id
+                 LIMIT %s
+                   FOR UPDATE SKIP LOCKED
+            """, [batch_size])
+            batch = self.browse([row[0] for row in self.env.cr.fetchall()])
+            if not batch:
+                return
+            done = failed = 0
+            for record in batch:
+                try:
+                    with self.env.cr.savepoint():
+                        # The cron user's company is not the order's company
+                        record.with_company(record.sale_id.company_id)._process_approval(
+                            approved_by=record.queued_by)
+                    done += 1
+                except Exception as e:
+                    record.write({'state': 'pending', 'processing_error': str(e)})
+                    failed += 1
+            self.env.cr.commit()
+            _logger.info("Processed %s queued invoice requests (%s failed)", done, failed)
+        # Budget spent with work left: schedule another run right away
+        self.env.ref('odoo_module.ir_cron_process_invoice_approvals')._trigger()
+
+    @api.model
+    def _cron_archive_approved_requests(self):
+        """Archive approved requests older than the configured age, committing
+        after each batch.
+        """
+        ICP = self.env['ir.config_parameter'].sudo()
+        days = int(ICP.get_param('odoo_module.archive_after_days', ARCHIVE_AFTER_DAYS))
+        batch_size = int(ICP.get_param('odoo_module.archive_batch_size', ARCHIVE_BATCH_SIZE))
+        cutoff = fields.Datetime.subtract(fields.Datetime.now(), days=days)
+        total = 0
+        while True:
+            batch = self.search([
+                ('state', '=', 'approved'),
+                ('approval_date', '<', cutoff),
+            ], order='approval_date', limit=batch_size)
+            if not batch:
+                break
+            batch.write({'active': False})
+            self.env.cr.commit()
+            total += len(batch)
+        if total:
+            _logger.info("Archived %s approved invoice requests older than %s days", total, days)
 
     def action_reset_to_pending(self):
         """Reset request to pending state"""
         for record in self:
-            if record.state not in ['approved', 'rejected']:
-                raise UserError(_('Only approved or rejected requests can be reset.'))
+            if record.state not in ['processing', 'approved', 'rejected']:
+                raise UserError(_('Only processing, approved or rejected requests can be reset.'))
             record.write({
                 'state': 'pending',
                 'approval_date': False,
                 'approved_by': False,
+                'queued_date': False,
+                'queued_by': False,
             })
         return True
 
     @api.constrains('partner_id', 'sale_id')
     def _check_partner_sale_consistency(self):
         """Ensure the sale order belongs to the partner"""
-        for record in self:
-            if record.partner_id and record.sale_id:
-                if record.sale_id.partner_id != record.partner_id:
-                    raise ValidationError(_('The sale order must belong to the selected partner.'))
-                # Prevent selecting SO that is not invoiceable anymore
-                if record.sale_id.state != 'sale' or record.sale_id.invoice_status != 'to invoice':
-                    raise ValidationError(_('The sale order is no longer available for invoicing.'))
-                # Prevent duplicate requests on the same SO in pending/approved
-                existing = self.env['invoice.request'].search([
-                    ('id', '!=', record.id),
-                    ('partner_id', '=', record.partner_id.id),
-                    ('sale_id', '=', record.sale_id.id),
-                    ('state', 'in', ['pending', 'approved'])
-                ], limit=1)
-                if existing:
-                    raise ValidationError(_('A request already exists for this sale order.'))
+        records = self.filtered(lambda r: r.partner_id and r.sale_id)
+        for record in records:
+            if record.sale_id.partner_id != record.partner_id:
+                raise ValidationError(_('The sale order must belong to the selected partner.'))
+            # Prevent selecting SO that is not invoiceable anymore
+            if record.sale_id.state != 'sale' or record.sale_id.invoice_status != 'to invoice':
+                raise ValidationError(_('The sale order is no longer available for invoicing.'))
+        # Prevent duplicate requests on the same SO in pending/processing/approved, checked
+        # for the whole batch in one query
+        active = records.filtered(lambda r: r.state in ['pending', 'processing', 'approved'])
+        if len(active.sale_id) != len(active):
+            raise ValidationError(_('A request already exists for this sale order.'))
+        if records:
+            existing = self.env['invoice.request'].with_context(active_test=False).search_count([
+                ('id', 'not in', records.ids),
+                ('sale_id', 'in', records.sale_id.ids),
+                ('state', 'in', ['pending', 'processing', 'approved'])
+            ], limit=1)
+            if existing:
+                raise ValidationError(_('A request already exists for this sale order.'))
 
-    def get_available_sale_orders(self, partner_id):
-        """Get sale orders available for invoicing for a partner"""
-        return self.env['sale.order'].search([
+    @api.model
+    def _available_sale_orders_domain(self, partner_id):
+        """Domain of the partner's sale orders that can still be requested.
+        Already requested orders (pending/processing/approved) are excluded with a
+        subquery instead of loading the requested ids first.
+        """
+        return [
             ('partner_id', '=', partner_id),
             ('state', '=', 'sale'),
-            ('invoice_status', '=', 'to invoice')
-        ])
+            ('invoice_status', '=', 'to invoice'),
+            ('invoice_request_ids', 'not any', [
+                ('state', 'in', ['pending', 'processing', 'approved']),
+                ('active', 'in', [True, False]),
+            ]),
+        ]
+
+    def get_available_sale_orders(self, partner_id):
+        """Get sale orders available for invoicing for a partner"""
+        return self.env['sale.order'].search(self._available_sale_orders_domain(partner_id))
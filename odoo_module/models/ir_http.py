@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+
+import json
+
+import werkzeug.exceptions
+
+from odoo import models
+from odoo.http import request
+
+
+class IrHttp(models.AbstractModel):
+    _inherit = 'ir.http'
+
+    @classmethod
+    def _pre_dispatch(cls, rule, args):
+        # Routes declared with rate_limit='<kind>' are checked before the
+        # frontend pre-dispatch (language, session context) and the route
+        kind = rule.endpoint.routing.get('rate_limit')
+        if kind:
+            retry_after = request.env['invoice.request.rate.limit']._check_request(
+                kind, args.get('token'), request.httprequest.remote_addr,
+            )
+            if retry_after:
+                werkzeug.exceptions.abort(request.make_response(
+                    json.dumps({'success': False, 'message': 'Too many requests, retry in %s seconds' % retry_after}),
+                    headers=[('Content-Type', 'application/json'), ('Retry-After', str(retry_after))],
+                    status=429,
+                ))
+        super()._pre_dispatch(rule, args)
@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+
+import hashlib
+import math
+
+from odoo import models, api
+from odoo.tools import str2bool
+
+# Token bucket budgets per route kind: (burst, tokens refilled per second).
+# 'json' covers the form page and the JSON routes, 'pdf' the invoice downloads.
+# Override with the odoo_module.rate_limit_<kind> system parameter, e.g.
+# "30,1" for a burst of 30 requests refilled at one request per second.
+RATE_LIMIT_BUDGETS = {
+    'json': (30, 1.0),
+    'pdf': (5, 0.1),
+}
+# Client IPs get this many times the per-token budget, since several
+# partners may share one address
+IP_BUDGET_FACTOR = 4
+
+
+class InvoiceRequestRateLimit(models.AbstractModel):
+    _name = 'invoice.request.rate.limit'
+    _description = 'Invoice Portal Rate Limit Buckets'
+
+    def init(self):
+        # Token buckets shared by all workers. The table is unlogged: losing
+        # it on a crash only refills the buckets.
+        self.env.cr.execute("""
+            CREATE UNLOGGED TABLE IF NOT EXISTS invoice_request_rate_limit (
+                key varchar PRIMARY KEY,
+                burst double precision NOT NULL,
+                rate double precision NOT NULL,
+                tokens double precision NOT NULL,
+                updated_at timestamptz NOT NULL
+            )
+        """)
+
+    @api.model
+    def _get_budget(self, kind):
+        burst, rate = RATE_LIMIT_BUDGETS[kind]
+        value = self.env['ir.config_parameter'].sudo().get_param('odoo_module.rate_limit_%s' % kind)
+        if value:
+            try:
+                burst, rate = (float(part) for part in value.split(','))
+            except ValueError:
+                pass
+        return max(burst, 1.0), max(rate, 0.001)
+
+    @api.model
+    def _check_request(self, kind, token, remote_addr):
+        """Take one ``kind`` token for a call made with the access ``token``
+        from ``remote_addr``. Returns the seconds to wait before retrying, or
+        0 when the call is allowed (or rate limiting is disabled)."""
+        # Configuration is cached in memory, this costs no query once warm
+        params = self.env['ir.config_parameter'].sudo()
+        if not str2bool(params.get_param('odoo_module.rate_limit_enabled', 'True')):
+            return 0
+        burst, rate = self._get_budget(kind)
+        # Key on a digest so live access tokens are not copied into the table
+        token_digest = hashlib.sha256((token or '').encode()).hexdigest()[:32]
+        return self._take([
+            ('token:%s:%s' % (token_digest, kind), burst, rate),
+            ('ip:%s:%s' % (remote_addr, kind), burst * IP_BUDGET_FACTOR, rate * IP_BUDGET_FACTOR),
+        ])
+
+    @api.model
+    def _take(self, buckets):
+        """Take one token from each bucket and return the seconds to wait
+        before retrying, or 0 when every bucket had a token left.
+
+        ``buckets`` is a list of ``(key, burst, rate)`` where ``burst`` is the
+        bucket size and ``rate`` the tokens refilled per second. Tokens are
+        only taken when all buckets allow the call. The update runs in its
+        own short transaction so a bucket row is never locked for the
+        duration of the request.
+        """
+        # Lock rows in key order so concurrent calls cannot deadlock
+        keys, bursts, rates = zip(*sorted(buckets))
+        with self.env.registry.cursor() as cr:
+            # Refill (or create full) every bucket and lock its row
+            cr.execute("""
+                INSERT INTO invoice_request_rate_limit AS b (key, burst, rate, tokens, updated_at)
+                SELECT v.key, v.burst, v.rate, v.burst, statement_timestamp()
+                  FROM unnest(%s::varchar[], %s::float8[], %s::float8[]) AS v(key, burst, rate)
+                    ON CONFLICT (key) DO UPDATE SET
+                       burst = EXCLUDED.burst,
+                       rate = EXCLUDED.rate,
+                       tokens = LEAST(EXCLUDED.burst, b.tokens + EXTRACT(EPOCH FROM statement_timestamp() - b.updated_at) * EXCLUDED.rate),
+                       updated_at = statement_timestamp()
+             RETURNING tokens, rate
+            """, [list(keys), list(bursts), list(rates)])
+            retry_after = max(
+                [math.ceil((1 - tokens) / rate) for tokens, rate in cr.fetchall() if tokens < 1],
+                default=0,
+            )
+            if not retry_after:
+                cr.execute("""
+                    UPDATE invoice_request_rate_limit
+                       SET tokens = tokens - 1
+                     WHERE key = ANY(%s)
+                """, [list(keys)])
+        return retry_after
+
+    @api.model
+    def _cron_clean_buckets(self):
+        """Drop buckets idle for a day, they would be full again anyway"""
+        self.env.cr.execute("""
+            DELETE FROM invoice_request_rate_limit
+             WHERE updated_at < statement_timestamp() - interval '1 day'
+        """)
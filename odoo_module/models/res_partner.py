@@ -1,8 +1,17 @@
 # -*- coding: utf-8 -*-
 
-from odoo import models, fields, api
+import logging
 import uuid
 
+from odoo import models, fields, api
+from odoo.tools import split_every
+
+_logger = logging.getLogger(__name__)
+
+# Number of partners touched per SQL statement when tokens are generated,
+# rotated or expired in bulk.
+TOKEN_BATCH_SIZE = 10000
+
 
 class ResPartner(models.Model):
     _inherit = 'res.partner'
@@ -13,6 +22,12 @@ class ResPartner(models.Model):
         copy=False,
         index=True
     )
+    external_token_expired = fields.Boolean(
+        string='External Token Expired',
+        help='Set when the token was expired on purpose, so that generating '
+             'missing tokens does not give this partner a new one',
+        copy=False
+    )
     invoice_request_ids = fields.One2many(
         'invoice.request',
         'partner_id',
@@ -32,9 +47,105 @@ class ResPartner(models.Model):
         """Generate a unique external token for the partner"""
         for partner in self:
             if not partner.external_token:
-                partner.external_token = str(uuid.uuid4())
+                partner.write({
+                    'external_token': str(uuid.uuid4()),
+                    'external_token_expired': False,
+                })
         return True
 
+    def _set_external_tokens_sql(self, partner_ids, expire=False):
+        """Assign fresh tokens (or clear them when expiring) with one UPDATE"""
+        if not partner_ids:
+            return
+        if expire:
+            self.env.cr.execute("""
+                UPDATE res_partner
+                   SET external_token = NULL,
+                       external_token_expired = TRUE,
+                       write_uid = %s,
+                       write_date = (now() at time zone 'UTC')
+                 WHERE id = ANY(%s)
+            """, [self.env.uid, list(partner_ids)])
+        else:
+            tokens = [str(uuid.uuid4()) for _pid in partner_ids]
+            self.env.cr.execute("""
+                UPDATE res_partner AS p
+                   SET external_token = v.token,
+                       external_token_expired = FALSE,
+                       write_uid = %s,
+                       write_date = (now() at time zone 'UTC')
+                  FROM unnest(%s::int[], %s::varchar[]) AS v(id, token)
+                 WHERE p.id = v.id
+            """, [self.env.uid, list(partner_ids), tokens])
+
+    @api.model
+    def _generate_missing_external_tokens(self, domain=None, batch_size=TOKEN_BATCH_SIZE, commit=False):
+        """Give a token to every active partner that has none, one batch at a
+        time. Partners whose token was expired are skipped; rotate them to
+        issue a new one.
+
+        ``domain`` restricts the partners considered; without it the whole
+        table is scanned in id order. With ``commit=True`` each batch is
+        committed on its own so that large partner tables are never held in
+        a single long transaction.
+        """
+        self.flush_model(['external_token', 'external_token_expired', 'active'])
+        if domain is not None:
+            partner_ids = self.search(domain + [
+                ('external_token', '=', False),
+                ('external_token_expired', '=', False),
+            ]).ids
+            batches = split_every(batch_size, partner_ids, list)
+        else:
+            batches = self._iter_partners_without_token(batch_size)
+        total = 0
+        for batch in batches:
+            self._set_external_tokens_sql(batch)
+            total += len(batch)
+            if commit:
+                self.env.cr.commit()
+            _logger.info("Generated external tokens for %s partners so far", total)
+        self.invalidate_model(['external_token', 'external_token_expired', 'write_uid', 'write_date'])
+        return total
+
+    @api.model
+    def _iter_partners_without_token(self, batch_size):
+        """Yield ids of active partners without a token, by keyset on id so
+        that each batch starts where the previous one stopped."""
+        last_id = 0
+        while True:
+            self.env.cr.execute("""
+                SELECT id FROM res_partner
+                 WHERE external_token IS NULL
+                   AND external_token_expired IS NOT TRUE
+                   AND active
+                   AND id > %s
+                 ORDER BY id
+                 LIMIT %s
+            """, [last_id, batch_size])
+            partner_ids = [row[0] for row in self.env.cr.fetchall()]
+            if not partner_ids:
+                return
+            last_id = partner_ids[-1]
+            yield partner_ids
+
+    @api.model
+    def _rotate_external_tokens(self, domain, expire=False, batch_size=TOKEN_BATCH_SIZE, commit=False):
+        """Replace (or clear, when ``expire`` is set) the tokens of all
+        partners matching ``domain``, in batches of ``batch_size``."""
+        self.flush_model(['external_token', 'external_token_expired'])
+        partner_ids = self.search(domain).ids
+        done = 0
+        for batch in split_every(batch_size, partner_ids, list):
+            self._set_external_tokens_sql(batch, expire=expire)
+            done += len(batch)
+            if commit:
+                self.env.cr.commit()
+            _logger.info("%s external tokens for %s/%s partners",
+                         'Expired' if expire else 'Rotated', done, len(partner_ids))
+        self.invalidate_model(['external_token', 'external_token_expired', 'write_uid', 'write_date'])
+        return done
+
     def action_view_invoice_requests(self):
         """Action to view invoice requests for this partner"""
         action = self.env['ir.actions.act_window']._for_xml_id('odoo_module.action_invoice_request')
@@ -0,0 +1,13 @@
+# -*- coding: utf-8 -*-
+
+from odoo import models, fields
+
+
+class SaleOrder(models.Model):
+    _inherit = 'sale.order'
+
+    invoice_request_ids = fields.One2many(
+        'invoice.request',
+        'sale_id',
+        string='Invoice Requests'
+    )
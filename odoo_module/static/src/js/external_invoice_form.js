@@ -1,17 +1,19 @@
 /** @odoo-module **/
 
-import { Component, onMounted, useRef, useState } from "@odoo/owl";
+import { Component, useRef, useState } from "@odoo/owl";
 import dom from "@web/legacy/js/core/dom";
 import { _t } from "@web/core/l10n/translation";
 import { registry } from "@web/core/registry";
-import { useService } from "@web/core/utils/hooks";
+import { debounce } from "@web/core/utils/timing";
+
+// Delay between the last keystroke and the sale order search request (ms)
+const SEARCH_DEBOUNCE_DELAY = 300;
 
 export class ExternalInvoiceForm extends Component {
     static template = "odoo_module.ExternalInvoiceForm";
 
     setup() {
         this.rootRef = useRef("root");
-        this.rpc = useService("rpc");
         
         this.state = useState({
             loading: false,
@@ -19,25 +21,176 @@ export class ExternalInvoiceForm extends Component {
             messageType: 'info',
             error: false,
             success: false,
+            results: [],
+            // Sale order typeahead
+            query: this.props.sale_orders_query || '',
+            saleOrders: this.props.sale_orders || [],
+            nextCursor: this.props.sale_orders_next_cursor || null,
+            selectedSaleOrders: [],
+            searching: false,
+            // Request lists, patched in place after each submission
+            pendingRequests: this.props.pending_requests || [],
+            approvedRequests: this.props.approved_requests || [],
+            approvedNextCursor: this.props.approved_next_cursor || null,
+            loadingHistory: false,
         });
 
-        onMounted(() => {
-            const selectEl = this.rootRef.el.querySelector('#sale_order');
-            if (selectEl) {
-                const handler = () => this.refreshSaleOrderOptions();
-                selectEl.addEventListener('focus', handler);
-                selectEl.addEventListener('click', handler);
-            }
+        // Result pages keyed by query and cursor, and the requests still running
+        this.pageCache = new Map();
+        this.pendingPages = new Map();
+        this.pageCache.set(this._pageKey(this.state.query, null), {
+            sale_orders: this.state.saleOrders,
+            next_cursor: this.state.nextCursor,
         });
+        this.debouncedSearch = debounce(() => this.searchSaleOrders(), SEARCH_DEBOUNCE_DELAY);
+    }
+
+    _pageKey(query, cursor) {
+        return query + '|' + (cursor || '');
+    }
+
+    /**
+     * Fetch one page of available sale orders. Pages are served from the
+     * in-memory cache when possible and concurrent calls for the same page
+     * share a single request.
+     */
+    fetchSaleOrderPage(query, cursor) {
+        const key = this._pageKey(query, cursor);
+        if (this.pageCache.has(key)) {
+            return Promise.resolve(this.pageCache.get(key));
+        }
+        if (this.pendingPages.has(key)) {
+            return this.pendingPages.get(key);
+        }
+        const params = new URLSearchParams();
+        if (query) {
+            params.set('q', query);
+        }
+        if (cursor) {
+            params.set('cursor', cursor);
+        }
+        const url = '/external/sale-invoice/' + this.props.token + '/available_sos?' + params.toString();
+        const promise = fetch(url, { headers: { Accept: 'application/json' } })
+            .then(response => response.json())
+            .then(data => {
+                if (!data || !data.success) {
+                    throw new Error((data && data.error) || _t('Failed to refresh sale orders.'));
+                }
+                this.pageCache.set(key, data);
+                return data;
+            })
+            .finally(() => this.pendingPages.delete(key));
+        this.pendingPages.set(key, promise);
+        return promise;
+    }
+
+    onInputSearch(ev) {
+        this.state.query = ev.target.value.trim();
+        this.debouncedSearch();
+    }
+
+    async searchSaleOrders() {
+        if (!this.props.token) {
+            return;
+        }
+        const query = this.state.query;
+        this.state.searching = true;
+        try {
+            const data = await this.fetchSaleOrderPage(query, null);
+            // Ignore answers for a query the user already changed
+            if (query !== this.state.query) {
+                return;
+            }
+            this.state.saleOrders = data.sale_orders || [];
+            this.state.nextCursor = data.next_cursor || null;
+            this.state.error = false;
+        } catch (e) {
+            this.state.error = e.message || _t('Network error during refresh.');
+        } finally {
+            this.state.searching = false;
+        }
+    }
+
+    async onClickLoadMore() {
+        const query = this.state.query;
+        const cursor = this.state.nextCursor;
+        if (!cursor) {
+            return;
+        }
+        this.state.searching = true;
+        try {
+            const data = await this.fetchSaleOrderPage(query, cursor);
+            if (query !== this.state.query || cursor !== this.state.nextCursor) {
+                return;
+            }
+            this.state.saleOrders = [...this.state.saleOrders, ...(data.sale_orders || [])];
+            this.state.nextCursor = data.next_cursor || null;
+        } catch (e) {
+            this.state.error = e.message || _t('Network error during refresh.');
+        } finally {
+            this.state.searching = false;
+        }
+    }
+
+    async onClickLoadOlderInvoices() {
+        const cursor = this.state.approvedNextCursor;
+        if (!cursor || this.state.loadingHistory) {
+            return;
+        }
+        this.state.loadingHistory = true;
+        try {
+            const url = '/external/sale-invoice/' + this.props.token + '/status?before=' + encodeURIComponent(cursor);
+            const response = await fetch(url, { headers: { Accept: 'application/json' } });
+            const data = await response.json();
+            if (!data || !data.success) {
+                this.state.error = (data && data.message) || _t('Failed to load older invoices.');
+                return;
+            }
+            this.state.approvedRequests = [...this.state.approvedRequests, ...(data.approved_requests || [])];
+            this.state.approvedNextCursor = data.approved_next_cursor || null;
+        } catch (e) {
+            this.state.error = _t('Network error during refresh.');
+        } finally {
+            this.state.loadingHistory = false;
+        }
+    }
+
+    isSelected(saleOrder) {
+        return this.state.selectedSaleOrders.some(so => so.id === saleOrder.id);
+    }
+
+    onToggleSaleOrder(saleOrder) {
+        if (this.isSelected(saleOrder)) {
+            this.state.selectedSaleOrders = this.state.selectedSaleOrders.filter(so => so.id !== saleOrder.id);
+        } else {
+            this.state.selectedSaleOrders.push(saleOrder);
+        }
+    }
+
+    /**
+     * Patch the component state with the delta returned by the request
+     * endpoint instead of reloading the page.
+     */
+    applyRequestDelta(data) {
+        const removedIds = new Set(data.removed_sale_order_ids || []);
+        if (removedIds.size) {
+            this.state.saleOrders = this.state.saleOrders.filter(so => !removedIds.has(so.id));
+            this.state.selectedSaleOrders = this.state.selectedSaleOrders.filter(so => !removedIds.has(so.id));
+            // Cached pages still list the removed orders
+            this.pageCache.clear();
+        }
+        if (data.created_requests && data.created_requests.length) {
+            this.state.pendingRequests = [...data.created_requests, ...this.state.pendingRequests];
+        }
     }
 
     async onClickSubmit() {
         const form = this.rootRef.el.querySelector('#invoice-request-form');
         const formData = new FormData(form);
-        const saleOrderId = formData.get('sale_order_id');
+        const saleOrderIds = formData.getAll('sale_order_ids');
         
-        if (!saleOrderId) {
-            this.state.error = 'Please select a sale order.';
+        if (!saleOrderIds.length) {
+            this.state.error = 'Please select at least one sale order.';
             return;
         }
 
@@ -46,9 +199,14 @@ export class ExternalInvoiceForm extends Component {
         const restoreBtnLoading = dom.addButtonLoadingEffect(button);
 
         try {
-            const data = await this.rpc('/external/sale-invoice/' + this.props.token + '/request', { 
-                sale_order_id: saleOrderId 
+            // The request route is a plain HTTP route reading form fields, so
+            // post the form data rather than a JSON-RPC body
+            const response = await fetch('/external/sale-invoice/' + this.props.token + '/request', {
+                method: 'POST',
+                body: formData,
+                headers: { Accept: 'application/json' },
             });
+            const data = await response.json();
             
             if (data.force_refresh) {
                 restoreBtnLoading();
@@ -61,17 +219,21 @@ export class ExternalInvoiceForm extends Component {
                 return new Promise(() => {});
             }
             
-            this.state.error = data.error || false;
+            const saleOrderNames = Object.fromEntries(
+                this.state.selectedSaleOrders.map(so => [String(so.id), so.name])
+            );
+            this.state.results = (data.results || []).map(result => ({
+                ...result,
+                sale_order_name: saleOrderNames[String(result.sale_order_id)] || String(result.sale_order_id),
+            }));
+            this.state.error = data.error || (!data.success && data.message) || false;
             this.state.success = !data.error && {
                 message: data.message,
                 redirectUrl: data.redirect_url,
                 redirectMessage: data.redirect_message,
             };
             
-            if (data.success) {
-                form.reset();
-                setTimeout(() => window.location.reload(), 1500);
-            }
+            this.applyRequestDelta(data);
         } catch (error) {
             this.state.error = 'Network error. Please try again.';
         } finally {
@@ -79,42 +241,6 @@ export class ExternalInvoiceForm extends Component {
             button.prepend(icon);
         }
     }
-
-    async refreshSaleOrderOptions() {
-        if (!this.props.token) {
-            return;
-        }
-        try {
-            const data = await this.rpc('/external/sale-invoice/' + this.props.token + '/available_sos', {});
-            if (!data || !data.success) {
-                this.state.error = (data && data.error) || _t('Failed to refresh sale orders.');
-                return;
-            }
-            const selectEl = this.rootRef.el.querySelector('#sale_order');
-            if (!selectEl) return;
-            const currentVal = selectEl.value;
-            // Rebuild options
-            selectEl.innerHTML = '';
-            const placeholder = document.createElement('option');
-            placeholder.value = '';
-            placeholder.textContent = _t('Choose a sale order...');
-            selectEl.appendChild(placeholder);
-            for (const so of (data.sale_orders || [])) {
-                const opt = document.createElement('option');
-                opt.value = String(so.id);
-                opt.textContent = (so.name || '') + ' - ' + (so.amount_total != null ? so.amount_total : 0);
-                selectEl.appendChild(opt);
-            }
-            // If previous value still exists, keep it; else clear selection
-            if (currentVal && Array.from(selectEl.options).some(o => o.value === currentVal)) {
-                selectEl.value = currentVal;
-            } else {
-                selectEl.value = '';
-            }
-        } catch (e) {
-            this.state.error = _t('Network error during refresh.');
-        }
-    }
 }
 
 registry.category("public_components").add("odoo_module.external_invoice_form", ExternalInvoiceForm);
@@ -0,0 +1,6 @@
+# -*- coding: utf-8 -*-
+
+from . import test_query_counts
+from . import test_benchmark
+from . import test_rate_limit
+from . import test_approval_queue
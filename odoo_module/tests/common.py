@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+
+from odoo import Command
+from odoo.addons.account.tests.common import AccountTestInvoicingHttpCommon
+from odoo.tools import split_every
+
+# Records created per ORM call when seeding large volumes
+SEED_BATCH_SIZE = 1000
+
+
+class InvoiceRequestCommon(AccountTestInvoicingHttpCommon):
+
+    @classmethod
+    def setUpClass(cls, chart_template_ref=None):
+        super().setUpClass(chart_template_ref=chart_template_ref)
+        # Tests call the routes far more often than the portal budgets allow
+        params = cls.env['ir.config_parameter'].sudo()
+        params.set_param('odoo_module.rate_limit_enabled', 'False')
+        # Keep every call on the same path: no randomly sampled route timing
+        params.set_param('odoo_module.timing_sample_rate', '0')
+        cls.product = cls.env['product.product'].create({
+            'name': 'Invoice Request Service',
+            'type': 'service',
+            'invoice_policy': 'order',
+            'list_price': 100.0,
+        })
+        cls.portal_partner = cls.env['res.partner'].create({'name': 'Portal Customer'})
+        cls.portal_partner.generate_external_token()
+        cls.token = cls.portal_partner.external_token
+
+    @classmethod
+    def _create_sale_orders(cls, partner, count):
+        """Create ``count`` confirmed, invoiceable sale orders for ``partner``"""
+        sale_orders = cls.env['sale.order']
+        for batch in split_every(SEED_BATCH_SIZE, range(count)):
+            sale_orders |= cls.env['sale.order'].create([{
+                'partner_id': partner.id,
+                'state': 'sale',
+                'order_line': [Command.create({
+                    'product_id': cls.product.id,
+                    'product_uom_qty': 1,
+                    'price_unit': 100.0,
+                })],
+            } for _i in batch])
+        cls.env.flush_all()
+        return sale_orders
+
+    @classmethod
+    def _create_invoices(cls, partner, count):
+        """Create ``count`` posted customer invoices for ``partner``"""
+        invoices = cls.env['account.move']
+        for batch in split_every(SEED_BATCH_SIZE, range(count)):
+            invoices |= cls.env['account.move'].create([{
+                'move_type': 'out_invoice',
+                'partner_id': partner.id,
+                'invoice_line_ids': [Command.create({
+                    'product_id': cls.product.id,
+                    'quantity': 1,
+                    'price_unit': 100.0,
+                })],
+            } for _i in batch])
+        invoices.action_post()
+        return invoices
+
+    @classmethod
+    def _create_requests(cls, sale_orders, state='pending', invoices=None):
+        """Create one request per sale order. Approved requests are linked
+        to ``invoices`` in turn (one each when there are enough), so that
+        serializing them reads many distinct invoices."""
+        requests = cls.env['invoice.request']
+        for batch in split_every(SEED_BATCH_SIZE, sale_orders.ids):
+            requests |= cls.env['invoice.request'].create([{
+                'partner_id': cls.env['sale.order'].browse(sale_order_id).partner_id.id,
+                'sale_id': sale_order_id,
+            } for sale_order_id in batch])
+        if state == 'approved':
+            for index, invoice in enumerate(invoices[:len(requests)]):
+                requests[index::len(invoices)].write({
+                    'state': 'approved',
+                    'invoice_id': invoice.id,
+                    'approval_date': '2000-01-01 00:00:00',
+                })
+        cls.env.flush_all()
+        return requests
+
+    def _route(self, path=''):
+        return '/external/sale-invoice/%s%s' % (self.token, path)
+
+    def _count_queries(self, func):
+        """Return the number of SQL queries run by ``func``, HTTP calls included"""
+        # Same cache state as assertQueryCount, which invalidates on entry
+        self.env.invalidate_all()
+        self.env.flush_all()
+        start = self.cr.sql_log_count
+        func()
+        self.env.flush_all()
+        return self.cr.sql_log_count - start
@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+
+from unittest.mock import patch
+
+from odoo import Command
+from odoo.tests import tagged
+
+from .common import InvoiceRequestCommon
+
+
+@tagged('post_install', '-at_install')
+class TestInvoiceRequestApprovalQueue(InvoiceRequestCommon):
+
+    def _run_worker(self):
+        """Run the approval cron once; its per batch commits are no-ops here"""
+        with patch.object(self.env.cr, 'commit', lambda: None):
+            self.env['invoice.request']._cron_process_approvals()
+        self.env.invalidate_all()
+
+    def test_worker_approves_queued_requests(self):
+        requests = self._create_requests(self._create_sale_orders(self.portal_partner, 3))
+        requests.action_queue_approval()
+        self.assertEqual(set(requests.mapped('state')), {'processing'})
+        self._run_worker()
+        self.assertEqual(set(requests.mapped('state')), {'approved'})
+        self.assertFalse(any(requests.mapped('processing_error')))
+        self.assertEqual(requests.approved_by, self.env.user)
+        self.assertEqual(set(requests.invoice_id.mapped('state')), {'posted'})
+
+    def test_worker_failure_returns_request_to_pending(self):
+        requests = self._create_requests(self._create_sale_orders(self.portal_partner, 2))
+        requests.action_queue_approval()
+        requests[0].sale_id.write({'state': 'cancel'})
+        self._run_worker()
+        self.assertEqual(requests[0].state, 'pending')
+        self.assertTrue(requests[0].processing_error)
+        self.assertFalse(requests[0].invoice_id)
+        # The failure does not roll back the rest of the batch
+        self.assertEqual(requests[1].state, 'approved')
+        self.assertFalse(requests[1].processing_error)
+
+    def test_worker_invoices_in_sale_order_company(self):
+        company = self.company_data_2['company']
+        sale_order = self.env['sale.order'].with_company(company).create({
+            'partner_id': self.portal_partner.id,
+            'company_id': company.id,
+            'state': 'sale',
+            'order_line': [Command.create({
+                'product_id': self.product.id,
+                'product_uom_qty': 1,
+                'price_unit': 100.0,
+            })],
+        })
+        invoice_request = self._create_requests(sale_order)
+        invoice_request.action_queue_approval()
+        self._run_worker()
+        self.assertEqual(invoice_request.state, 'approved')
+        self.assertEqual(invoice_request.invoice_id.company_id, company)
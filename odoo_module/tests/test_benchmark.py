@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+
+import logging
+import os
+import statistics
+import time
+
+from odoo.tests import tagged
+
+from .common import InvoiceRequestCommon
+
+_logger = logging.getLogger(__name__)
+
+# Record volumes to benchmark, e.g. ODOO_MODULE_BENCH_VOLUMES=10,1000,100000
+BENCH_VOLUMES = [
+    int(volume) for volume in os.environ.get('ODOO_MODULE_BENCH_VOLUMES', '10,1000,100000').split(',')
+]
+# Timed calls per route and volume, the median is reported
+BENCH_RUNS = 3
+# Requests approved per approval_request call
+BENCH_APPROVAL_BATCH = 10
+# Distinct invoices shared by the seeded approved requests, more than a
+# history page so each page reads as many invoices as it lists requests
+BENCH_INVOICES = 50
+
+
+@tagged('post_install', '-at_install', '-standard', 'odoo_module_bench')
+class TestInvoiceRequestBenchmark(InvoiceRequestCommon):
+    """Scaling benchmark of the portal routes and approvals.
+
+    Not part of the standard run, select it explicitly with
+    ``--test-tags odoo_module_bench``. Each volume tops the portal partner up
+    to that many available sale orders, pending requests and approved
+    requests, logs the median timing of every route and checks that route
+    query counts stay at the level measured for the smallest volume.
+    """
+
+    def _routes(self):
+        return {
+            'form': self._route(),
+            'available_sos': self._route('/available_sos'),
+            'status': self._route('/status'),
+            'download': self._route('/download/%s' % self.invoice.id),
+        }
+
+    def _time_route(self, url):
+        durations = []
+        for _run in range(BENCH_RUNS):
+            start = time.perf_counter()
+            response = self.url_open(url, timeout=120)
+            durations.append(time.perf_counter() - start)
+            self.assertEqual(response.status_code, 200)
+        return statistics.median(durations)
+
+    def test_benchmark_routes(self):
+        invoices = self._create_invoices(self.portal_partner, BENCH_INVOICES)
+        self.invoice = invoices[0]
+        baselines = {}
+        report = []
+        seeded = 0
+        for volume in sorted(BENCH_VOLUMES):
+            missing = volume - seeded
+            self._create_sale_orders(self.portal_partner, missing)
+            self._create_requests(self._create_sale_orders(self.portal_partner, missing))
+            self._create_requests(
+                self._create_sale_orders(self.portal_partner, missing),
+                state='approved', invoices=invoices,
+            )
+            seeded = volume
+
+            for route, url in self._routes().items():
+                self.url_open(url, timeout=120)  # warm caches
+                if route not in baselines:
+                    baselines[route] = self._count_queries(lambda: self.url_open(url, timeout=120))
+                with self.assertQueryCount(baselines[route]):
+                    self.url_open(url, timeout=120)
+                report.append((volume, route, self._time_route(url)))
+
+            sale_orders = self._create_sale_orders(self.portal_partner, BENCH_APPROVAL_BATCH)
+            data = {'sale_order_ids': ','.join(map(str, sale_orders.ids))}
+            start = time.perf_counter()
+            self.url_open(self._route('/request'), data=data, timeout=120)
+            report.append((volume, 'request (%s orders)' % BENCH_APPROVAL_BATCH, time.perf_counter() - start))
+
+            requests = self.env['invoice.request'].search([('sale_id', 'in', sale_orders.ids)])
+            start = time.perf_counter()
+            requests.approval_request()
+            self.env.flush_all()
+            report.append((volume, 'approval_request (%s requests)' % len(requests), time.perf_counter() - start))
+
+        _logger.info(
+            "Invoice request benchmark:\n%s",
+            '\n'.join('%8d records  %-32s %9.1f ms' % (volume, route, duration * 1000)
+                      for volume, route, duration in report),
+        )
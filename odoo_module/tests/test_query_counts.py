@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+
+from odoo.tests import tagged
+
+from .common import InvoiceRequestCommon
+
+
+@tagged('post_install', '-at_install')
+class TestInvoiceRequestQueryCounts(InvoiceRequestCommon):
+    """Query counts of the portal routes and approvals must not grow with
+    the amount of data a partner has (no N+1 on orders or requests)."""
+
+    def _seed(self, count):
+        """Add ``count`` available orders, pending and approved requests,
+        each approved request with its own invoice"""
+        self._create_sale_orders(self.portal_partner, count)
+        self._create_requests(self._create_sale_orders(self.portal_partner, count))
+        invoices = self._create_invoices(self.portal_partner, count)
+        self._create_requests(
+            self._create_sale_orders(self.portal_partner, count),
+            state='approved', invoices=invoices,
+        )
+        return invoices
+
+    def _assert_flat_route(self, path=''):
+        self._seed(3)
+        self.url_open(self._route(path))  # warm caches
+        baseline = self._count_queries(lambda: self.url_open(self._route(path)))
+        self._seed(30)
+        self.url_open(self._route(path))  # warm caches again after seeding
+        with self.assertQueryCount(baseline):
+            self.url_open(self._route(path))
+
+    def test_form_query_count(self):
+        self._assert_flat_route()
+
+    def test_available_sale_orders_query_count(self):
+        self._assert_flat_route('/available_sos')
+
+    def test_status_query_count(self):
+        self._assert_flat_route('/status')
+
+    def test_download_query_count(self):
+        invoice = self._seed(1)
+        self._assert_flat_route('/download/%s' % invoice.id)
+
+    def test_request_query_count(self):
+        sale_orders = self._create_sale_orders(self.portal_partner, 22)
+        self.url_open(self._route('/request'), data={'sale_order_ids': sale_orders[0].id})  # warm caches
+        baseline = self._count_queries(lambda: self.url_open(
+            self._route('/request'), data={'sale_order_ids': ','.join(map(str, sale_orders[1:3].ids))},
+        ))
+        with self.assertQueryCount(baseline):
+            self.url_open(self._route('/request'), data={'sale_order_ids': ','.join(map(str, sale_orders[3:].ids))})
+        self.assertEqual(
+            self.env['invoice.request'].search_count([('sale_id', 'in', sale_orders.ids)]), 22,
+        )
+
+    def test_approval_query_count(self):
+        requests = self._create_requests(self._create_sale_orders(self.portal_partner, 11))
+        requests[0].approval_request()  # warm caches
+        per_request = self._count_queries(requests[1].approval_request)
+        # Approving a batch costs at most the same per request
+        with self.assertQueryCount(per_request * 9):
+            requests[2:].approval_request()
+        self.assertEqual(set(requests.mapped('state')), {'approved'})
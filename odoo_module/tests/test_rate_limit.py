@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+
+from odoo.tests import tagged
+
+from .common import InvoiceRequestCommon
+
+
+@tagged('post_install', '-at_install')
+class TestInvoiceRequestRateLimit(InvoiceRequestCommon):
+
+    def setUp(self):
+        super().setUp()
+        params = self.env['ir.config_parameter'].sudo()
+        params.set_param('odoo_module.rate_limit_enabled', 'True')
+        params.set_param('odoo_module.rate_limit_json', '2,0.01')
+        params.set_param('odoo_module.rate_limit_pdf', '1,0.01')
+
+    def test_json_budget_exhausted(self):
+        for _i in range(2):
+            self.assertEqual(self.url_open(self._route('/status')).status_code, 200)
+        response = self.url_open(self._route('/status'))
+        self.assertEqual(response.status_code, 429)
+        self.assertTrue(int(response.headers['Retry-After']) > 0)
+        self.assertFalse(response.json()['success'])
+
+    def test_budgets_are_separate(self):
+        invoice = self._create_invoices(self.portal_partner, 1)
+        self._create_requests(
+            self._create_sale_orders(self.portal_partner, 1),
+            state='approved', invoices=invoice,
+        )
+        download = self._route('/download/%s' % invoice.id)
+        self.assertEqual(self.url_open(download).status_code, 200)
+        self.assertEqual(self.url_open(download).status_code, 429)
+        # The JSON budget of the same token is untouched
+        self.assertEqual(self.url_open(self._route('/status')).status_code, 200)
+
+    def test_rejected_call_runs_fewer_queries(self):
+        self.url_open(self._route('/status'))  # warm caches
+        allowed = self._count_queries(lambda: self.url_open(self._route('/status')))
+        rejected = self._count_queries(lambda: self.assertEqual(
+            self.url_open(self._route('/status')).status_code, 429,
+        ))
+        # A rejected call stops in pre-dispatch after the bucket update, so it
+        # runs fewer queries than the route it would have reached
+        self.assertLess(rejected, allowed)
+
+    def test_rejected_call_takes_no_token(self):
+        other_partner = self.env['res.partner'].create({'name': 'Other Portal Customer'})
+        other_partner.generate_external_token()
+        # Exhaust this token, then keep calling: the rejected calls must not
+        # drain the IP bucket the other token shares (burst 2 * 4 = 8)
+        for _i in range(7):
+            self.url_open(self._route('/status'))
+        other_status = '/external/sale-invoice/%s/status' % other_partner.external_token
+        for _i in range(2):
+            self.assertEqual(self.url_open(other_status).status_code, 200)
+
+    def test_token_not_stored_in_clear(self):
+        self.url_open(self._route('/status'))
+        self.env.cr.execute("SELECT key FROM invoice_request_rate_limit")
+        keys = [row[0] for row in self.env.cr.fetchall()]
+        self.assertTrue(keys)
+        self.assertFalse([key for key in keys if self.token in key])
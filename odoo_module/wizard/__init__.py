@@ -0,0 +1,3 @@
+# -*- coding: utf-8 -*-
+
+from . import partner_token_wizard
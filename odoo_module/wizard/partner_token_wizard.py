@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+
+import ast
+
+from odoo import models, fields, api, _
+from odoo.exceptions import UserError
+
+
+class PartnerTokenWizard(models.TransientModel):
+    _name = 'res.partner.token.wizard'
+    _description = 'Bulk External Token Management'
+
+    operation = fields.Selection([
+        ('generate', 'Generate Missing Tokens'),
+        ('rotate', 'Rotate Tokens'),
+        ('expire', 'Expire Tokens'),
+    ], string='Operation', default='generate', required=True)
+    partner_domain = fields.Char(
+        string='Partners',
+        default='[]',
+        help='Partners whose tokens will be generated, rotated or expired'
+    )
+    partner_count = fields.Integer(
+        string='Matching Partners',
+        compute='_compute_partner_count'
+    )
+
+    @api.model
+    def default_get(self, fields_list):
+        res = super().default_get(fields_list)
+        # Prefill the segment with the ticked partners only. active_domain is
+        # the whole list's search domain, even when a few rows are ticked.
+        ctx = self.env.context
+        if ctx.get('active_model') == 'res.partner' and ctx.get('active_ids'):
+            res['partner_domain'] = repr([('id', 'in', ctx['active_ids'])])
+        return res
+
+    def _get_partner_domain(self):
+        self.ensure_one()
+        try:
+            return ast.literal_eval(self.partner_domain or '[]')
+        except (ValueError, SyntaxError):
+            raise UserError(_('The partner filter is not a valid domain.'))
+
+    @api.depends('partner_domain')
+    def _compute_partner_count(self):
+        Partner = self.env['res.partner']
+        for wizard in self:
+            try:
+                wizard.partner_count = Partner.search_count(wizard._get_partner_domain())
+            except UserError:
+                wizard.partner_count = 0
+
+    def action_apply(self):
+        """Run the selected token operation on the partner segment.
+        Each batch is committed on its own so large segments do not hold one
+        long transaction.
+        """
+        self.ensure_one()
+        Partner = self.env['res.partner']
+        domain = self._get_partner_domain()
+        if self.operation == 'generate':
+            # An empty filter scans the whole table by keyset on id.
+            Partner._generate_missing_external_tokens(domain=domain or None, commit=True)
+        else:
+            if not domain:
+                raise UserError(_('Select the partners whose tokens should be rotated or expired; '
+                                  'an empty filter would target every partner.'))
+            Partner._rotate_external_tokens(
+                domain,
+                expire=self.operation == 'expire',
+                commit=True,
+            )
+        return {'type': 'ir.actions.act_window_close'}